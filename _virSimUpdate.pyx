@@ -0,0 +1,73 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Compiled Patient.update() time step, used by virSim when this extension has
+been built (python setup.py build_ext --inplace). It needs neither numba nor
+a JIT warm-up.
+"""
+
+import numpy
+
+cimport numpy as cnp
+from cpython.pycapsule cimport PyCapsule_GetPointer, PyCapsule_IsValid
+from numpy.random cimport bitgen_t
+
+cnp.import_array()
+
+
+def updateStep(const cnp.uint64_t[::1] bits, double clearProb,
+               double maxBirthProb, double mutProb, double maxPop,
+               cnp.uint64_t activeMask, int nDrugs, rng):
+    """
+    Runs a single Patient.update() time step on the resistance bits of a
+    patient's virus particles. Survivors are written to the front of one
+    output buffer and their (mutated) offspring are appended after them.
+    Random numbers are drawn directly from the bit generator of rng.
+
+    bits: the resistance bits of the virus particles (an array of uint64,
+    one per virus particle)
+
+    activeMask: the bits of the drugs being administered (a uint64)
+
+    nDrugs: the number of drugs known to the patient (an integer)
+
+    rng: the patient's random number generator (a numpy.random.Generator)
+
+    returns: the resistance bits after the time step
+    """
+    cdef Py_ssize_t n = bits.shape[0]
+    cdef Py_ssize_t i, k
+    cdef Py_ssize_t survivors = 0
+    cdef int j
+    cdef double probability
+    cdef cnp.uint64_t parent, flip
+    cdef bitgen_t *bitgen
+
+    capsule = rng.bit_generator.capsule
+    if not PyCapsule_IsValid(capsule, "BitGenerator"):
+        raise ValueError('rng does not expose a BitGenerator capsule')
+    bitgen = <bitgen_t *> PyCapsule_GetPointer(capsule, "BitGenerator")
+
+    # Every survivor has at most one child, so 2*n entries suffice.
+    result = numpy.empty(2*n, dtype=numpy.uint64)
+    cdef cnp.uint64_t[::1] out = result
+
+    with rng.bit_generator.lock, nogil:
+        for i in range(n):
+            if bitgen.next_double(bitgen.state) > clearProb:
+                out[survivors] = bits[i]
+                survivors += 1
+        probability = maxBirthProb*(1 - survivors/maxPop)
+
+        k = survivors
+        for i in range(survivors):
+            parent = out[i]
+            if (bitgen.next_double(bitgen.state) < probability and
+                    (parent & activeMask) == activeMask):
+                flip = 0
+                for j in range(nDrugs):
+                    if bitgen.next_double(bitgen.state) < mutProb:
+                        flip |= (<cnp.uint64_t> 1) << j
+                out[k] = parent ^ flip
+                k += 1
+
+    return result[:k]
@@ -0,0 +1,22 @@
+from setuptools import Extension, setup
+
+# The compiled update step is optional: virSim falls back to numba or NumPy
+# when it is not built, so a plain install works without Cython.
+try:
+    import numpy
+    from Cython.Build import cythonize
+except ImportError:
+    ext_modules = []
+else:
+    ext_modules = cythonize(
+        [Extension('_virSimUpdate', ['_virSimUpdate.pyx'],
+                   include_dirs=[numpy.get_include()],
+                   extra_compile_args=['-O3'])],
+    )
+
+setup(
+    name='virusSimulation',
+    py_modules=['virSim'],
+    install_requires=['numpy'],
+    ext_modules=ext_modules,
+)
@@ -1,12 +1,28 @@
+import functools
+import logging
 import numpy
-import random
-import pylab
+from multiprocessing import Pool
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    from _virSimUpdate import updateStep
+except ImportError:
+    updateStep = None
+
+logger = logging.getLogger(__name__)
+
+rng = numpy.random.default_rng()
 
 class NoChildException(Exception):
     """
-    NoChildException is raised by the reproduce() method in the SimpleVirus
-    and ResistantVirus classes to indicate that a virus particle does not
-    reproduce. 
+    NoChildException used to be raised by the reproduce() method in the
+    SimpleVirus and ResistantVirus classes to indicate that a virus particle
+    does not reproduce. reproduce() now returns None instead and never raises
+    it; the class is kept for callers that still catch it.
     """    
 
 
@@ -34,11 +50,11 @@ class SimpleVirus(object):
         Stochastically determines whether this virus is cleared from the
         patient's body at a time step. 
 
-        returns: Using a random number generator (random.random()), this method
-        returns True with probability self.clearProb and otherwise returns
-        False.
+        returns: Using the module's random number generator (rng.random()),
+        this method returns True with probability self.clearProb and otherwise
+        returns False.
         """
-        random_float = random.random()
+        random_float = rng.random()
         if random_float <= self.clearProb:
             return True
         else:
@@ -61,16 +77,30 @@ class SimpleVirus(object):
         
         returns: a new instance of the SimpleVirus class representing the
         offspring of this virus particle. The child should have the same
-        maxBirthProb and clearProb values as this virus. Raises a
-        NoChildException if this virus particle does not reproduce.               
+        maxBirthProb and clearProb values as this virus. Returns None if
+        this virus particle does not reproduce.               
         """
 
-        probability = self.maxBirthProb*(1 - popDensity)
-        random_float = random.random()
-        if  random_float <= probability:
+        return self.reproducePre(self.maxBirthProb*(1 - popDensity))
+
+    def reproducePre(self, birthProb):
+        """
+        Same as reproduce(), but takes the reproduction probability
+        self.maxBirthProb * (1 - popDensity) precomputed by the caller, so a
+        time step computes it once instead of once per virus particle.
+
+        birthProb: the probability that this virus particle reproduces (a
+        float)
+
+        returns: the offspring SimpleVirus instance, or None if this virus
+        particle does not reproduce.
+        """
+
+        random_float = rng.random()
+        if  random_float <= birthProb:
             return SimpleVirus(self.maxBirthProb, self.clearProb)
         else:
-            raise NoChildException(Exception)
+            return None
             
 class SimplePatient(object):
     """
@@ -78,19 +108,31 @@ class SimplePatient(object):
     and his/her virus populations have no drug resistance.
     """
     
-    def __init__(self, viruses, maxPop):
+    def __init__(self, viruses, maxPop, generator=None):
         """
-        Initialization function, saves the viruses and maxPop parameters as
-        attributes.
+        Initialization function, saves the size of the virus population and
+        the maxPop parameter as attributes.
 
         viruses: the list representing the virus population (a list of
         SimpleVirus instances)
         
         maxPop: the  maximum virus population for this patient (an integer)
+
+        generator: the random number generator used by update() (a
+        numpy.random.Generator). Defaults to the module-level rng.
         """
 
-        self.viruses = viruses
+        self.n = len(viruses)
         self.maxPop = maxPop
+        self.rng = rng if generator is None else generator
+        # SimpleVirus particles are homogeneous, so the population is just a
+        # count sharing the birth and clearance probabilities of the viruses.
+        if viruses:
+            self.maxBirthProb = viruses[0].maxBirthProb
+            self.clearProb = viruses[0].clearProb
+        else:
+            self.maxBirthProb = 0.0
+            self.clearProb = 0.0
         
 
     def getTotalPop(self):
@@ -100,7 +142,7 @@ class SimplePatient(object):
         returns: The total virus population (an integer)
         """
      
-        return len(self.viruses)
+        return self.n
 
     def update(self):
         """
@@ -119,18 +161,13 @@ class SimplePatient(object):
         returns: the total virus population at the end of the update (an
         integer)
         """
-        virus_pop = self.viruses[:]
-        for virus in self.viruses:
-            if virus.doesClear():
-                virus_pop.remove(virus)
-        popDensity = len(virus_pop)/float(self.maxPop )      
-        self.viruses = virus_pop[:] 
-        for virus in virus_pop:
-            try:
-                offspring = virus.reproduce(popDensity)
-                self.viruses.append(offspring)
-            except NoChildException:
-                continue
+        # All viruses share the same probabilities, so the number of
+        # survivors and births are binomially distributed.
+        survivors = int(self.rng.binomial(self.n, 1 - self.clearProb))
+        popDensity = survivors/float(self.maxPop)
+        probability = max(0.0, self.maxBirthProb*(1 - popDensity))
+        births = int(self.rng.binomial(survivors, probability))
+        self.n = survivors + births
         return self.getTotalPop()    
         
 def problem2():
@@ -142,12 +179,14 @@ def problem2():
     total virus population as a function of time.    
     """
 
+    import matplotlib.pyplot as plt
+
     maxBirthProb = 0.1
     clearProb = 0.05
     viruses = []
     maxPop = 1000
     time = 200
-    timesteps = pylab.arange(1,time+1)
+    timesteps = numpy.arange(1,time+1)
     for i in range(0,100):
         virus=SimpleVirus(maxBirthProb,clearProb)
         viruses.append(virus)
@@ -158,13 +197,12 @@ def problem2():
     for i in timesteps:
         current_pop = patient.update()
         population.append(current_pop)
-    pylab.plot(timesteps,population)
-    pylab.xlabel('Time Steps')
-    pylab.ylabel('Virus Population')
-    pylab.title('Virus population as a function of time')
-    pylab.show()
+    plt.plot(timesteps,population)
+    plt.xlabel('Time Steps')
+    plt.ylabel('Virus Population')
+    plt.title('Virus population as a function of time')
+    plt.show()
 
-#print problem2()
     
 
 class ResistantVirus(SimpleVirus):
@@ -249,72 +287,209 @@ class ResistantVirus(SimpleVirus):
         
         returns: a new instance of the ResistantVirus class representing the
         offspring of this virus particle. The child should have the same
-        maxBirthProb and clearProb values as this virus. Raises a
-        NoChildException if this virus particle does not reproduce.         
-        """
-#        print 'reproduce function'
-        resistance = True
-
-        for drug in activeDrugs:
- #           print 'DRUG: ',drug
-            if not self.getResistance(drug):
-#                print 'drug ',drug
-                resistance = False
-#                print 'resistance ',resistance
-##            else:
-##                resistance = False
-
-#        print 'resistance ',resistance
-
-        if resistance or len(activeDrugs)==0:
-            probability = self.maxBirthProb*(1-popDensity)
-            randomFloat = random.random()
-            if randomFloat <= probability:
-                randomRes = random.random()
-#                print 'new offspring'
-                if randomRes<=self.mutProb:
-##                    print 'resistance CHANGED'
-                    offres = {}
-                    for resistance in self.resistances:
-                        if self.resistances[resistance]:
-                            offres[resistance]=False
-                        else:
-                            offres[resistance]=True
-                    return ResistantVirus(self.maxBirthProb,self.clearProb,offres,self.mutProb)
-##                else:
-##                    print 'resistance unchanged'
-                return ResistantVirus(self.maxBirthProb, self.clearProb,self.resistances,self.mutProb)
+        maxBirthProb and clearProb values as this virus. Returns None if
+        this virus particle does not reproduce.         
+        """
+        return self.reproducePre(self.maxBirthProb*(1-popDensity), activeDrugs)
+
+    def reproducePre(self, birthProb, activeDrugs):
+        """
+        Same as reproduce(), but takes the reproduction probability
+        self.maxBirthProb * (1 - popDensity) precomputed by the caller, so a
+        time step computes it once instead of once per virus particle.
+
+        birthProb: the probability that this virus particle reproduces if it
+        is resistant to all drugs in activeDrugs (a float)
+
+        activeDrugs: a list of the drug names acting on this virus particle
+        (a list of strings).
+
+        returns: the offspring ResistantVirus instance, or None if this virus
+        particle does not reproduce.
+        """
+
+        if activeDrugs:
+            resistance = all(self.resistances[drug] for drug in activeDrugs)
+        else:
+            resistance = True
+
+        if resistance:
+            randomFloat = rng.random()
+            if randomFloat <= birthProb:
+                # Each resistance trait flips independently with probability
+                # mutProb.
+                offres = {}
+                for drug in self.resistances:
+                    if rng.random() < self.mutProb:
+                        offres[drug] = not self.resistances[drug]
+                    else:
+                        offres[drug] = self.resistances[drug]
+                return ResistantVirus(self.maxBirthProb,self.clearProb,offres,self.mutProb)
             else:
-#                print 'Exception error: Not Born'
-                raise NoChildException(Exception)            
+                return None            
         else:
-#            print 'Exception error: No resistance to Drug'
-            raise NoChildException(Exception)
+            return None
         
         
             
+if numba is not None:
+    @functools.lru_cache(maxsize=None)
+    def _makeUpdateKernel(nDrugs):
+        """
+        Returns a compiled Patient.update() kernel specialized to a patient
+        with nDrugs drugs. nDrugs is a compile-time constant of the kernel, so
+        the per-drug mutation loop is unrolled; one kernel is built (and
+        cached) per drug count.
+
+        nDrugs: the number of drugs known to the patient (an integer)
+        """
+
+        @numba.njit(cache=True)
+        def _updateKernel(bits, activeMask, clearProb, maxBirthProb, mutProb,
+                          maxPop, clearDraws, birthDraws, mutDraws):
+            """
+            Compiled version of a single Patient.update() time step.
+            Clearance and reproduction are fused into one output buffer: the
+            survivors are written to its front, then their (mutated)
+            offspring are appended after them, so no intermediate masks or
+            copies are needed.
+
+            bits: the resistance bits of the patient's virus particles (an
+            array of uint64, one per virus particle)
+
+            activeMask: the bits of the drugs being administered (a uint64)
+
+            clearDraws, birthDraws: uniform random numbers, one per virus
+            particle
+
+            mutDraws: uniform random numbers, one per virus particle and drug
+
+            returns: the resistance bits after the time step
+            """
+            n = len(bits)
+            # Every survivor has at most one child, so 2*n entries suffice.
+            out = numpy.empty(2*n, dtype=numpy.uint64)
+            survivors = 0
+            for i in range(n):
+                if clearDraws[i] > clearProb:
+                    out[survivors] = bits[i]
+                    survivors += 1
+            probability = maxBirthProb*(1 - survivors/maxPop)
+
+            k = survivors
+            for i in range(survivors):
+                parent = out[i]
+                if (birthDraws[i] < probability and
+                        (parent & activeMask) == activeMask):
+                    flip = numpy.uint64(0)
+                    for j in range(nDrugs):
+                        if mutDraws[i, j] < mutProb:
+                            flip |= numpy.uint64(1) << numpy.uint64(j)
+                    out[k] = parent ^ flip
+                    k += 1
+            return out[:k]
+
+        return _updateKernel
+else:
+    _makeUpdateKernel = None
+
+
 class Patient(SimplePatient):
     """
     Representation of a patient. The patient is able to take drugs and his/her
     virus population can acquire resistance to the drugs he/she takes.
     """
     
-    def __init__(self, viruses, maxPop):
+    def __init__(self, viruses, maxPop, generator=None):
         """
-        Initialization function, saves the viruses and maxPop parameters as
-        attributes. Also initializes the list of drugs being administered
-        (which should initially include no drugs).               
+        Initialization function, saves the virus population and maxPop
+        parameters as attributes. Also initializes the list of drugs being
+        administered (which should initially include no drugs).               
+
+        The resistances of each virus particle are packed into a single
+        machine word: self.bits holds one uint64 per virus particle, with bit
+        self.drugBit[drug] set if the particle is resistant to drug. The
+        birth, clearance and mutation probabilities shared by all particles
+        are kept as attributes of the patient.
 
         viruses: the list representing the virus population (a list of
-        SimpleVirus instances)
+        ResistantVirus instances)
         
         maxPop: the  maximum virus population for this patient (an integer)
+
+        generator: the random number generator used by update() (a
+        numpy.random.Generator). Defaults to the module-level rng.
         """
 
-        self.viruses = viruses
         self.maxPop = maxPop
+        self.rng = rng if generator is None else generator
         self.drugs = []
+        self.activeMask = numpy.uint64(0)
+        self.drugBit = {}
+        for virus in viruses:
+            for drug in virus.resistances:
+                if drug not in self.drugBit:
+                    self._addDrug(drug)
+        self.bits = numpy.zeros(len(viruses), dtype=numpy.uint64)
+        for i, virus in enumerate(viruses):
+            resistant = [drug for drug in virus.resistances
+                         if virus.resistances[drug]]
+            self.bits[i] = self._mask(resistant)
+        if viruses:
+            self.maxBirthProb = viruses[0].maxBirthProb
+            self.clearProb = viruses[0].clearProb
+            self.mutProb = viruses[0].mutProb
+        else:
+            self.maxBirthProb = 0.0
+            self.clearProb = 0.0
+            self.mutProb = 0.0
+
+    def _addDrug(self, drug):
+        """
+        Assigns the next free resistance bit to drug. Virus particles start
+        out not resistant to it.
+
+        drug: the name of the drug (a string)
+        """
+
+        if len(self.drugBit) == 64:
+            raise ValueError('at most 64 drugs are supported')
+        self.drugBit[drug] = len(self.drugBit)
+
+    def _mask(self, drugs):
+        """
+        Returns the resistance bits of the drugs in drugs ORed together (a
+        uint64).
+        """
+
+        mask = 0
+        for drug in drugs:
+            mask |= 1 << self.drugBit[drug]
+        return numpy.uint64(mask)
         
+    def copy(self, generator=None):
+        """
+        Returns an independent copy of this patient. The resistance array is
+        copied with a single array copy and the shared probabilities are
+        reused, so no ResistantVirus objects are created.
+
+        generator: the random number generator of the copy (a
+        numpy.random.Generator). Defaults to the module-level rng.
+
+        returns: a new Patient instance with the same virus population and
+        prescriptions as this patient
+        """
+
+        other = Patient([], self.maxPop, generator)
+        other.bits = self.bits.copy()
+        other.drugs = list(self.drugs)
+        other.activeMask = self.activeMask
+        other.drugBit = dict(self.drugBit)
+        other.maxBirthProb = self.maxBirthProb
+        other.clearProb = self.clearProb
+        other.mutProb = self.mutProb
+        return other
+
     def addPrescription(self, newDrug):
         """
         Administer a drug to this patient. After a prescription is added, the 
@@ -326,9 +501,14 @@ class Patient(SimplePatient):
         postcondition: list of drugs being administered to a patient is updated
         """
 
+        if newDrug not in self.drugBit:
+            self._addDrug(newDrug)
         if newDrug not in self.drugs:
             self.drugs.append(newDrug)
-        print 'self.drugs ',self.drugs
+            # Bits of the drugs being administered, kept here so update()
+            # does not look them up every time step.
+            self.activeMask = self._mask(self.drugs)
+        logger.debug('Prescriptions: %s', self.drugs)
         return self.drugs
 
     def getPrescriptions(self):
@@ -341,6 +521,15 @@ class Patient(SimplePatient):
 
         return self.drugs
 
+    def getTotalPop(self):
+        """
+        Gets the current total virus population. 
+
+        returns: The total virus population (an integer)
+        """
+
+        return len(self.bits)
+
         
     def getResistPop(self, drugResist):
         """
@@ -354,18 +543,8 @@ class Patient(SimplePatient):
         drugs in the drugResist list.
         """
 
-        resistPop = []
-        for virus in self.viruses:
-            resistance = False
-            for drug in drugResist:
-                if virus.getResistance(drug):
-                    resistance = True
-                else:
-                    resistance = False
-            if resistance:
-                resistPop.append(virus)
-                
-        return len(resistPop)
+        mask = self._mask(drugResist)
+        return int(((self.bits & mask) == mask).sum())
     
     
     def update(self):
@@ -387,28 +566,53 @@ class Patient(SimplePatient):
         returns: the total virus population at the end of the update (an
         integer)
         """
- 
-##        print '\n'
-##        print 'update function'
-        virus_pop = self.viruses[:]
-
-        for virus in self.viruses:
-            if virus.doesClear():
-                virus_pop.remove(virus)
-        popDensity = len(virus_pop)/float(self.maxPop )      
-        self.viruses = virus_pop[:]
-        count = 1
-        for virus in virus_pop:
-##            print '\n'
-##            print 'virus',virus
-            try:
-##                print '\n'
-##                print 'try ',count
-                count+=1
-                offspring = virus.reproduce(popDensity,self.drugs)
-                self.viruses.append(offspring)
-            except NoChildException:
-                continue
+
+        n = len(self.bits)
+        d = len(self.drugBit)
+        if updateStep is not None:
+            self.bits = updateStep(self.bits, self.clearProb,
+                                   self.maxBirthProb, self.mutProb,
+                                   float(self.maxPop), self.activeMask, d,
+                                   self.rng)
+            return self.getTotalPop()
+
+        if _makeUpdateKernel is not None:
+            kernel = _makeUpdateKernel(d)
+            self.bits = kernel(self.bits, self.activeMask, self.clearProb,
+                               self.maxBirthProb, self.mutProb,
+                               float(self.maxPop), self.rng.random(n),
+                               self.rng.random(n), self.rng.random((n, d)))
+            return self.getTotalPop()
+
+        # Viruses with the same resistance bits are interchangeable, so the
+        # population is simulated as counts per resistance pattern: survivors
+        # and births of each pattern are binomially distributed.
+        patterns, counts = numpy.unique(self.bits, return_counts=True)
+        survivors = self.rng.binomial(counts, 1 - self.clearProb)
+        popDensity = survivors.sum()/float(self.maxPop )      
+
+        # Viruses not resistant to every active drug have a birth probability
+        # of zero; with no active drugs the mask test is True for every virus.
+        resistant = (patterns & self.activeMask) == self.activeMask
+        probability = max(0.0, self.maxBirthProb*(1-popDensity))
+        births = self.rng.binomial(survivors, probability*resistant)
+
+        # Each resistance trait of an offspring flips independently with
+        # probability mutProb: for every drug, a binomial share of each group
+        # of offspring moves to the pattern with that bit flipped.
+        childPatterns, childCounts = patterns, births
+        for bit in range(d):
+            flipped = self.rng.binomial(childCounts, self.mutProb)
+            flip = numpy.uint64(1) << numpy.uint64(bit)
+            childPatterns = numpy.concatenate((childPatterns,
+                                               childPatterns ^ flip))
+            childCounts = numpy.concatenate((childCounts - flipped, flipped))
+            nonEmpty = childCounts > 0
+            childPatterns = childPatterns[nonEmpty]
+            childCounts = childCounts[nonEmpty]
+
+        self.bits = numpy.repeat(numpy.concatenate((patterns, childPatterns)),
+                                 numpy.concatenate((survivors, childCounts)))
             
         return self.getTotalPop()    
                 
@@ -424,6 +628,8 @@ def problem4():
     vs. time are plotted
     """
 
+    import matplotlib.pyplot as plt
+
     maxPop = 1000
     virNum = 100
     viruses = []
@@ -431,66 +637,85 @@ def problem4():
     clearProb = 0.05
     resistances = {'guttagonol':False}
     mutProb = 0.005
-    print 'Creating a virus database'
+    logger.info('Creating a virus database.')
     for i in range(virNum):
         virus = ResistantVirus(maxBirthProb, clearProb, resistances, mutProb)
         viruses.append(virus)
 
-    print 'Initializating a Patient.'
+    logger.info('Initializing a Patient.')
     patientX = Patient(viruses,maxPop)
     time = 150
-    timeSteps = pylab.arange(1,time+1)
+    timeSteps = numpy.arange(1,time+1)
     population = []
-    print 'Running simulation for',time,'timesteps.'
+    logger.info('Running simulation for %d timesteps.', time)
     for j in timeSteps:
         current_pop = patientX.update()
-#        print current_pop
+        logger.debug('Virus population: %d', current_pop)
         population.append(current_pop)
 
-    print 'Creating a plot for ',time,' timesteps.'
-    pylab.plot(population)
-    pylab.xlabel('Time Steps')
-    pylab.ylabel('Virus Population')
-    pylab.title('Total virus population vs. time')
-    pylab.show()    
+    logger.info('Creating a plot for %d timesteps.', time)
+    plt.plot(population)
+    plt.xlabel('Time Steps')
+    plt.ylabel('Virus Population')
+    plt.title('Total virus population vs. time')
+    plt.show()    
 
     
-    print 'Administering guttagonol to the patient.'
+    logger.info('Administering guttagonol to the patient.')
     patientX.addPrescription('guttagonol')
 
-    print 'Running simulation for',time,'timesteps.'
+    logger.info('Running simulation for %d timesteps.', time)
     for j in timeSteps:
         current_pop = patientX.update()
-#        print current_pop
+        logger.debug('Virus population: %d', current_pop)
         population.append(current_pop)
 
-    print 'Creating a plot for ',time,' timesteps.'  
-    pylab.plot(population)
-    pylab.xlabel('Time Steps')
-    pylab.ylabel('Virus Population')
-    pylab.title('Guttagonol-resistant virus population vs. time')   
-    pylab.show()
-
-##    print 'Administering grimpex to the patient.'
-##    patientX.addPrescription('grimpex')
-##
-##    print 'Running simulation for',time,'timesteps.'
-##    for j in timeSteps:
-##        current_pop = patientX.update()
-###        print current_pop
-##        population.append(current_pop)
-##
-##    print 'Creating a plot for ',time,' timesteps.'  
-##    pylab.plot(population)
-##    pylab.xlabel('Time Steps')
-##    pylab.ylabel('Virus Population')
-##    pylab.title('Grimpex-resistant virus population vs. time')   
-##    pylab.show()    
+    logger.info('Creating a plot for %d timesteps.', time)  
+    plt.plot(population)
+    plt.xlabel('Time Steps')
+    plt.ylabel('Virus Population')
+    plt.title('Guttagonol-resistant virus population vs. time')   
+    plt.show()
+
         
 #problem4()
 
       
-def problem5():
+def simulatePatient(seed, patient, delay, addSteps, drug):
+    """
+    Runs the treatment simulation for a single patient. Used as the task
+    function for the multiprocessing pools in problem5() and problem6().
+
+    The patient is updated for delay time steps, drug is administered, and
+    the patient is updated for addSteps more time steps.
+
+    seed: the seed for the patient's random number generator (a
+    numpy.random.SeedSequence or an integer)
+
+    patient: the initial state of the patient (a Patient instance). It is
+    copied, not modified, so the same patient can seed every task.
+
+    delay: the number of time steps before drug is administered (an integer)
+
+    addSteps: the number of time steps after drug is administered (an
+    integer)
+
+    drug: the name of the drug to administer (a string)
+
+    returns: the total virus population at the end of the simulation (an
+    integer)
+    """
+
+    patient = patient.copy(numpy.random.default_rng(seed))
+    for i in range(delay):
+        patient.update()
+    patient.addPrescription(drug)
+    for i in range(addSteps):
+        patient.update()
+    return patient.getTotalPop()
+
+
+def problem5(seed=None):
     """
     Runs simulations and make histograms for problem 5.
 
@@ -500,7 +725,14 @@ def problem5():
     Histograms of final total virus populations are displayed for delays of 300,
     150, 75, 0 timesteps (followed by an additional 150 timesteps of
     simulation).    
+
+    seed: the entropy for the patients' random number generators (an
+    integer). Defaults to fresh entropy, which is logged so a run can be
+    reproduced.
     """
+
+    import matplotlib.pyplot as plt
+
     steps = [300,150,75,0]
     addSteps = 150
     maxPop = 1000
@@ -511,48 +743,40 @@ def problem5():
     resistances = {'guttagonol':False}
     mutProb = 0.005
     numPatients = 10
-    print 'Creating a virus database'
+    logger.info('Creating a virus database.')
     for i in range(virNum):
         virus = ResistantVirus(maxBirthProb, clearProb, resistances, mutProb)
         viruses.append(virus)
 
-#    finalPop = []
-    for i in steps:
-        print 'Running simulation for ',i,' timesteps.'
-        result = []
-        for j in range(numPatients):
-#            print 'sim ',j
-            patientX = Patient(viruses,maxPop)
-            timeSteps = pylab.arange(1,i+1)
-            population = []
-            for k in timeSteps:
-                current_pop = patientX.update()
-                population.append(current_pop)
-            patientX.addPrescription('guttagonol')
-            for h in range(addSteps):
-                current_pop = patientX.update()
-                population.append(current_pop)
-            totalPop = patientX.getTotalPop()
-            result.append(totalPop)
-
-        print 'Printing Virus population for',numPatients,'patients.'
-        print result
-#        avgPop = sum(result)/float(len(result))
-#        print avgPop
-#        finalPop.append(avgPop)
-        pylab.figure()
-        print 'Creating a histogram for ',i,' timesteps.'
-        title = 'A final virus population with a drug after first '+ str(i)+' time steps'
-        pylab.hist(result)
-        pylab.xlabel('Total Virus Population')
-        pylab.ylabel('Number of patients')
-        pylab.title(title)
-        pylab.show()
+    patientX = Patient(viruses,maxPop)
+
+    # Every patient gets an independent random stream spawned from one seed.
+    seedSeq = numpy.random.SeedSequence(seed)
+    logger.info('Seed entropy: %d', seedSeq.entropy)
+
+    with Pool() as pool:
+        for i in steps:
+            logger.info('Running simulation for %d timesteps.', i)
+            seeds = seedSeq.spawn(numPatients)
+            result = pool.starmap(simulatePatient,
+                                  [(seed, patientX, i, addSteps, 'guttagonol')
+                                   for seed in seeds])
+
+            logger.info('Virus population for %d patients: %s', numPatients,
+                        result)
+            plt.figure()
+            logger.info('Creating a histogram for %d timesteps.', i)
+            title = 'A final virus population with a drug after first '+ str(i)+' time steps'
+            plt.hist(result)
+            plt.xlabel('Total Virus Population')
+            plt.ylabel('Number of patients')
+            plt.title(title)
+            plt.show()
         
 
 #problem5()        
 
-def problem6():
+def problem6(seed=None):
     """
     Runs simulations and make histograms for problem 6.
 
@@ -562,8 +786,14 @@ def problem6():
     Histograms of final total virus populations are displayed for lag times of
     150, 75, 0 timesteps between adding drugs (followed by an additional 150
     timesteps of simulation).
+
+    seed: the entropy for the random number generators of the first 150
+    timesteps and of the patients (an integer). Defaults to fresh entropy,
+    which is logged so a run can be reproduced.
     """
 
+    import matplotlib.pyplot as plt
+
     virNum = 100
     maxPop = 1000
     maxBirthProb = 0.1
@@ -576,60 +806,49 @@ def problem6():
     addSteps = 150
     numPatients = 30
     
-    print 'Creating a virus database.'
+    logger.info('Creating a virus database.')
     for i in range(virNum):
         virus = ResistantVirus(maxBirthProb,clearProb, resistances, mutProb)
         viruses.append(virus)
         
-    print 'Initializating a Patient.'
-    patientX = Patient(viruses,maxPop)
+    # The shared pre-run and every patient get independent random streams
+    # spawned from one seed.
+    seedSeq = numpy.random.SeedSequence(seed)
+    logger.info('Seed entropy: %d', seedSeq.entropy)
+
+    logger.info('Initializing a Patient.')
+    patientX = Patient(viruses,maxPop,
+                       numpy.random.default_rng(seedSeq.spawn(1)[0]))
     
     firstTimeSteps = 150
-    print 'Running simulation for first ',firstTimeSteps,' timesteps.'
+    logger.info('Running simulation for first %d timesteps.', firstTimeSteps)
     for i in range(firstTimeSteps):
         current_pop = patientX.update()
         virPop.append(current_pop)
-    print virPop
+    logger.info('Virus population: %s', virPop)
 
-    print 'Administering guttagonol to the patient.'
+    logger.info('Administering guttagonol to the patient.')
     patientX.addPrescription('guttagonol')
-#    virPop.append('Gutt')
 
-    
-    for j in simSteps:
-        print 'Running simulation for following condition : ',j,'timesteps.'
-        result = virPop[:]
-        finalPop = []
-
-        for k in range(numPatients):
-#            print 'Creating Patient Y'
-            population = result[:]
-            patientY = Patient(patientX.viruses,maxPop)
-#            print '--running simulation for ',j,' timesteps.'
-            for m in range(j):
-                pop = patientY.update()
-                population.append(pop)
-            
-            patientY.addPrescription('grimpex')
-#            population.append('Grim')
-            for n in range(addSteps):
-                pop = patientY.update()
-                population.append(pop)
-#            print 'final population'
-#            print population
-            totalPop = patientY.getTotalPop()
-            finalPop.append(totalPop)
+    with Pool() as pool:
+        for j in simSteps:
+            logger.info('Running simulation for following condition: %d '
+                        'timesteps.', j)
+            seeds = seedSeq.spawn(numPatients)
+            finalPop = pool.starmap(simulatePatient,
+                                    [(seed, patientX, j, addSteps, 'grimpex')
+                                     for seed in seeds])
         
-        print 'Printing Virus population for',numPatients,'patients.'
-        print finalPop
-        pylab.figure()
-        print 'Creating a histogram for ',j,' timesteps.'
-        title = 'A final virus population with second drug after '+ str(j)+' time steps ater fist drug.'
-        pylab.hist(finalPop)
-        pylab.xlabel('Total Virus Population')
-        pylab.ylabel('Number of patients')
-        pylab.title(title)
-        pylab.show()
+            logger.info('Virus population for %d patients: %s', numPatients,
+                        finalPop)
+            plt.figure()
+            logger.info('Creating a histogram for %d timesteps.', j)
+            title = 'A final virus population with second drug after '+ str(j)+' time steps ater fist drug.'
+            plt.hist(finalPop)
+            plt.xlabel('Total Virus Population')
+            plt.ylabel('Number of patients')
+            plt.title(title)
+            plt.show()
       
 #problem6()
 
@@ -645,6 +864,8 @@ def problem7(guttagonolAt,grimpexAt):
     a simulations for which drugs are administered simultaneously.        
     """
 
+    import matplotlib.pyplot as plt
+
     virNum = 100
     maxPop = 1000
     maxBirthProb = 0.1
@@ -657,18 +878,16 @@ def problem7(guttagonolAt,grimpexAt):
     grimpexResistant = []
     dualResistant = []
     timeStep = 1
-#    guttagonolAt = 150
-#    grimpexAt = 450 
     
-    print 'Creating a virus database.'
+    logger.info('Creating a virus database.')
     for i in range(virNum):
         virus = ResistantVirus(maxBirthProb,clearProb, resistances, mutProb)
         viruses.append(virus)
         
-    print 'Initializating a Patient.'
+    logger.info('Initializing a Patient.')
     patientX = Patient(viruses,maxPop)
 
-    print 'Running simulation'
+    logger.info('Running simulation.')
     while timeStep <= grimpexAt + 150:
         virPop = patientX.update()
         timeStep += 1        
@@ -681,19 +900,21 @@ def problem7(guttagonolAt,grimpexAt):
         grimpexResistant.append(patientX.getResistPop(['grimpex']))
         dualResistant.append(patientX.getResistPop(['guttagonol','grimpex']))
 
-    print 'Creating a plot of Total Population.'
-
-    pylab.figure()
-    pylab.plot(totViruses, label='Total')
-    pylab.plot(guttagonolResistant, label= 'Guttagonol resistant virus')
-    pylab.plot(grimpexResistant, label= 'Grimpex resistant virus')
-    pylab.plot(dualResistant, label= 'Resistant to both drugs')
-    pylab.xlabel('Time Steps')
-    pylab.ylabel('Virus Population')
-    pylab.title('Total virus population vs. time')
-    pylab.legend(loc = 4)
-    pylab.show()
-
-#problem7(guttagonolAt = 150, grimpexAt = 450)
-problem7(guttagonolAt = 150, grimpexAt = 150)
+    logger.info('Creating a plot of Total Population.')
+
+    plt.figure()
+    plt.plot(totViruses, label='Total')
+    plt.plot(guttagonolResistant, label= 'Guttagonol resistant virus')
+    plt.plot(grimpexResistant, label= 'Grimpex resistant virus')
+    plt.plot(dualResistant, label= 'Resistant to both drugs')
+    plt.xlabel('Time Steps')
+    plt.ylabel('Virus Population')
+    plt.title('Total virus population vs. time')
+    plt.legend(loc = 4)
+    plt.show()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+#    problem7(guttagonolAt = 150, grimpexAt = 450)
+    problem7(guttagonolAt = 150, grimpexAt = 150)
 
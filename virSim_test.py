@@ -1,3 +1,7 @@
+import numpy
+import pytest
+
+import virSim
 from virSim import *
 
 maxBirthProb = 0.9
@@ -19,7 +23,23 @@ def test_getResistPop():
     resVir = patientX.getResistPop(drugResist)
     return resVir
     
-#print test_getResistPop()
+
+def test_getResistPop_allDrugs():
+    viruses = []
+    for i in range(4):
+        virus = ResistantVirus(maxBirthProb,clearProb,
+                               {'guttagonol':True,'grimpex':False},mutProb)
+        viruses.append(virus)
+    for i in range(3):
+        virus = ResistantVirus(maxBirthProb,clearProb,
+                               {'guttagonol':True,'grimpex':True},mutProb)
+        viruses.append(virus)
+
+    patientX = Patient(viruses,maxPop)
+    assert patientX.getResistPop(['guttagonol']) == 7
+    assert patientX.getResistPop(['grimpex']) == 3
+    assert patientX.getResistPop(['guttagonol','grimpex']) == 3
+    assert patientX.getResistPop(['grimpex','guttagonol']) == 3
 
 def test_reproduce():
     resistances = {'guttagonol':True,'grimpex':False}
@@ -30,39 +50,27 @@ def test_reproduce():
     viruses = []
     for i in range(num_viruses):
         virus = ResistantVirus(maxBirthProb,clearProb,resistances,mutProb)
-        print 'created virus ', virus
         viruses.append(virus)
     vir_pop = viruses[:]
     for virus in viruses:
-        print '\n'
-        print 'virus, ',virus
-        try:
-            
-            offspring = virus.reproduce(popDensity,drugs )
+        offspring = virus.reproduce(popDensity,drugs )
+        if offspring is not None:
             vir_pop.append(offspring)
-          
-        except NoChildException:
-            continue
     return len(vir_pop)
     
-#print test_reproduce()
 
 
 
 def test_update():
     num_viruses = 10
-    print 'num_viruses ', num_viruses, 
     viruses = []
     population = []
     resistances = {'guttagonol':True}
     numSteps = 5
-    print 'numSteps ',numSteps
     
     for i in range(num_viruses):
         virus = ResistantVirus(maxBirthProb,clearProb,resistances,mutProb)
         viruses.append(virus)
-        print 'virus ',i , 'name ', virus
-        print 'self.resistance ', virus.resistances
     patientX = Patient(viruses,maxPop)
     patientX.addPrescription('guttagonol')
     
@@ -73,5 +81,179 @@ def test_update():
 
     return population
 
-#print test_update()
 
+
+def test_copy():
+    resistances = {'guttagonol':True,'grimpex':False}
+    viruses = []
+    for i in range(10):
+        virus = ResistantVirus(maxBirthProb,clearProb,resistances,mutProb)
+        viruses.append(virus)
+    patientX = Patient(viruses,maxPop)
+    patientX.addPrescription('guttagonol')
+
+    patientY = patientX.copy()
+    patientY.addPrescription('grimpex')
+    patientY.update()
+    assert patientX.getPrescriptions() == ['guttagonol']
+    assert patientX.getTotalPop() == 10
+    assert patientX.getResistPop(['guttagonol']) == 10
+
+
+def test_reproduce_mutation():
+    resistances = {'guttagonol':True,'grimpex':False}
+    virus = ResistantVirus(1.0,clearProb,resistances,1.0)
+    for i in range(10):
+        offspring = virus.reproduce(0.0,[])
+        assert offspring.resistances == {'guttagonol':False,'grimpex':True}
+
+    virus = ResistantVirus(1.0,clearProb,resistances,0.0)
+    for i in range(10):
+        offspring = virus.reproduce(0.0,[])
+        assert offspring.resistances == resistances
+
+    # Traits flip independently, so some offspring differ in one trait only.
+    virus = ResistantVirus(1.0,clearProb,resistances,0.5)
+    offspring = [virus.reproduce(0.0,[]) for i in range(200)]
+    assert any(o.resistances == {'guttagonol':False,'grimpex':False}
+               for o in offspring)
+
+def test_reproducePre():
+    virus = SimpleVirus(maxBirthProb,clearProb)
+    for i in range(10):
+        assert virus.reproducePre(0.0) is None
+        offspring = virus.reproducePre(1.0)
+        assert isinstance(offspring, SimpleVirus)
+        assert offspring.maxBirthProb == maxBirthProb
+        assert offspring.clearProb == clearProb
+
+    resistances = {'guttagonol':True,'grimpex':False}
+    virus = ResistantVirus(maxBirthProb,clearProb,resistances,0.0)
+    for activeDrugs in [[], ['guttagonol']]:
+        for i in range(10):
+            assert virus.reproducePre(0.0,activeDrugs) is None
+            offspring = virus.reproducePre(1.0,activeDrugs)
+            assert isinstance(offspring, ResistantVirus)
+            assert offspring.resistances == resistances
+    # A drug the virus is not resistant to stops reproduction.
+    for activeDrugs in [['grimpex'], ['guttagonol','grimpex']]:
+        for i in range(10):
+            assert virus.reproducePre(1.0,activeDrugs) is None
+
+
+backends = pytest.mark.parametrize('backend', ['numpy', 'numba', 'cython'])
+
+def useBackend(monkeypatch, backend):
+    """
+    Forces Patient.update() to run on the given backend, skipping the test
+    if that backend is not available.
+    """
+    if backend == 'numpy':
+        monkeypatch.setattr(virSim, 'updateStep', None)
+        monkeypatch.setattr(virSim, '_makeUpdateKernel', None)
+    elif backend == 'numba':
+        if virSim._makeUpdateKernel is None:
+            pytest.skip('numba is not installed')
+        monkeypatch.setattr(virSim, 'updateStep', None)
+    elif virSim.updateStep is None:
+        pytest.skip('the _virSimUpdate extension is not built')
+
+def makePatient(num_viruses, resistances, maxBirthProb, clearProb, mutProb,
+                maxPop=maxPop, seed=None):
+    viruses = []
+    for i in range(num_viruses):
+        virus = ResistantVirus(maxBirthProb,clearProb,resistances,mutProb)
+        viruses.append(virus)
+    return Patient(viruses,maxPop,numpy.random.default_rng(seed))
+
+@backends
+def test_update_noBirthsNoClearance(monkeypatch, backend):
+    useBackend(monkeypatch, backend)
+    patientX = makePatient(50,{'guttagonol':False},0.0,0.0,mutProb)
+    for i in range(10):
+        assert patientX.update() == 50
+
+@backends
+def test_update_drugStopsNonResistant(monkeypatch, backend):
+    useBackend(monkeypatch, backend)
+    patientX = makePatient(50,{'guttagonol':False},1.0,0.0,1.0)
+    patientX.addPrescription('guttagonol')
+    for i in range(10):
+        assert patientX.update() == 50
+        assert patientX.getResistPop(['guttagonol']) == 0
+
+@backends
+def test_update_mutationFlipsAllBits(monkeypatch, backend):
+    useBackend(monkeypatch, backend)
+    patientX = makePatient(50,{'guttagonol':True,'grimpex':False},1.0,0.0,
+                           1.0,maxPop=10**6)
+    total = patientX.update()
+    assert total > 50
+    # Parents keep their resistances; every offspring has both bits flipped.
+    assert patientX.getResistPop(['guttagonol']) == 50
+    assert patientX.getResistPop(['grimpex']) == total - 50
+    assert patientX.getResistPop(['guttagonol','grimpex']) == 0
+
+@backends
+def test_update_sameSeedSameTrajectory(monkeypatch, backend):
+    useBackend(monkeypatch, backend)
+    trajectories = []
+    for run in range(2):
+        patientX = makePatient(100,{'guttagonol':False,'grimpex':False},
+                               0.1,0.05,0.05,seed=42)
+        population = []
+        for i in range(60):
+            if i == 30:
+                patientX.addPrescription('guttagonol')
+            population.append((patientX.update(),
+                               patientX.getResistPop(['guttagonol'])))
+        trajectories.append(population)
+    assert trajectories[0] == trajectories[1]
+
+@backends
+def test_update_emptyPatient(monkeypatch, backend):
+    useBackend(monkeypatch, backend)
+    patientX = Patient([],maxPop)
+    assert patientX.update() == 0
+    patientX.addPrescription('guttagonol')
+    assert patientX.update() == 0
+
+def test_updateStep():
+    _virSimUpdate = pytest.importorskip('_virSimUpdate')
+    bits = numpy.array([0b01, 0b10, 0b11] * 20, dtype=numpy.uint64)
+
+    # No births and no clearance keep the resistance bits unchanged.
+    result = _virSimUpdate.updateStep(bits, 0.0, 0.0, 0.0, float(maxPop),
+                                      0, 2, numpy.random.default_rng())
+    assert numpy.array_equal(result, bits)
+
+    # Random numbers come from the generator's bit generator capsule, so the
+    # same seed gives the same step.
+    first = _virSimUpdate.updateStep(bits, 0.5, 0.9, 0.5, float(maxPop),
+                                     0b01, 2, numpy.random.default_rng(7))
+    second = _virSimUpdate.updateStep(bits, 0.5, 0.9, 0.5, float(maxPop),
+                                      0b01, 2, numpy.random.default_rng(7))
+    assert numpy.array_equal(first, second)
+
+    class BitGenerator(object):
+        capsule = None
+    class NoCapsule(object):
+        bit_generator = BitGenerator()
+    with pytest.raises(ValueError):
+        _virSimUpdate.updateStep(bits, 0.0, 0.0, 0.0, float(maxPop), 0, 2,
+                                 NoCapsule())
+
+def test_simulatePatient_sameSeedSameResult():
+    # Mirrors problem6(): the shared pre-run and every patient draw from
+    # streams spawned from one seed, so the whole sweep repeats exactly.
+    results = []
+    for run in range(2):
+        seedSeq = numpy.random.SeedSequence(12345)
+        patientX = makePatient(100,{'guttagonol':False,'grimpex':False},
+                               0.1,0.05,0.005,seed=seedSeq.spawn(1)[0])
+        for i in range(150):
+            patientX.update()
+        patientX.addPrescription('guttagonol')
+        results.append([simulatePatient(seed,patientX,75,150,'grimpex')
+                        for seed in seedSeq.spawn(3)])
+    assert results[0] == results[1]